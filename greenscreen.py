@@ -4,42 +4,105 @@ import argparse
 import json
 import os
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 
 import cv2
 import numpy as np
 
+# Screenshots warped per packed warpPerspective call in bulk mode
+BULK_BATCH = 8
 
-def detect_green_mask(image, hue_range=(35, 85), sat_min=50, val_min=50):
-    """Convert to HSV, threshold for green, clean with morphological ops. Returns binary mask."""
-    hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+# Smallest same-shaped group worth warping as one channel-packed image; below this the
+# merge and scatter copies cost more than the shared inverse-map walk saves
+PACKED_WARP_MIN = 6
+
+# Bulk screenshots are processed on a thread pool only for bases up to this size;
+# larger bases are better served by OpenCV's own per-kernel threading
+PARALLEL_MAX_PIXELS = 3840 * 2160
+
+# Radius of the 3x3 box edge feather in _precompute_alpha
+FEATHER_RADIUS = 1
+
+# Rows per band when thresholding, sized so the HSV band stays in cache
+MASK_STRIP_ROWS = 64
+
+# Warp device: "cpu" or "cuda" (experimental, requires an OpenCV build with the CUDA module)
+DEVICE = os.environ.get("GREENSCREEN_DEVICE", "cpu")
+if DEVICE == "cuda" and not (hasattr(cv2, "cuda") and cv2.cuda.getCudaEnabledDeviceCount() > 0):
+    print("Warning: no CUDA device available, warping on CPU", file=sys.stderr)
+    DEVICE = "cpu"
+
+
+def _odd(n):
+    """Nearest odd kernel size to n."""
+    return max(1, int(round(n)) | 1)
+
+
+def detect_green_mask(image, hue_range=(35, 85), sat_min=50, val_min=50, scale=1.0):
+    """Convert to HSV, threshold for green, clean with morphological ops. Returns binary mask.
+
+    scale is the image size relative to full resolution; kernels shrink with it.
+    """
     lower = np.array([hue_range[0], sat_min, val_min])
     upper = np.array([hue_range[1], 255, 255])
-    mask = cv2.inRange(hsv, lower, upper)
 
-    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (7, 7))
-    mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel, iterations=3)
-    mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel, iterations=2)
+    # Threshold band by band so the HSV intermediate never round-trips through memory
+    h, w = image.shape[:2]
+    mask = np.empty((h, w), dtype=np.uint8)
+    hsv = np.empty((min(MASK_STRIP_ROWS, h), w, 3), dtype=np.uint8)
+    for y0 in range(0, h, MASK_STRIP_ROWS):
+        y1 = min(y0 + MASK_STRIP_ROWS, h)
+        band = hsv[:y1 - y0]
+        cv2.cvtColor(image[y0:y1], cv2.COLOR_BGR2HSV, dst=band)
+        cv2.inRange(band, lower, upper, dst=mask[y0:y1])
+
+    # Close with a 19px octagon (13x13 square + 7x7 cross), roughly three passes of a
+    # 7x7 ellipse, then open with a 13x13 square. Squares take OpenCV's separable path.
+    square = cv2.getStructuringElement(cv2.MORPH_RECT, (_odd(13 * scale),) * 2)
+    cross = cv2.getStructuringElement(cv2.MORPH_CROSS, (_odd(7 * scale),) * 2)
+    mask = cv2.dilate(cv2.dilate(mask, square), cross)
+    mask = cv2.erode(cv2.erode(mask, square), cross)
+    mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, square)
     return mask
 
 
-def find_corners(mask):
-    """Find contours, get largest, approximate to 4 points. Returns 4 corners."""
+def find_corners(mask, scale=1.0):
+    """Find contours, get largest, approximate to 4 points. Returns 4 corners.
+
+    scale is the mask size relative to full resolution; the minimum area shrinks with it.
+    """
     contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
     if not contours:
         raise ValueError("No green screen region detected")
 
     largest = max(contours, key=cv2.contourArea)
     area = cv2.contourArea(largest)
-    if area < 1000:
+    if area < 1000 * scale * scale:
         raise ValueError(f"Green region too small (area={area})")
 
     peri = cv2.arcLength(largest, True)
 
-    # Try increasing epsilon until we get 4 points
-    for mult in [0.02, 0.03, 0.04, 0.05, 0.06, 0.08, 0.10]:
-        approx = cv2.approxPolyDP(largest, mult * peri, True)
-        if len(approx) == 4:
-            return approx.reshape(4, 2).astype(np.float32)
+    # Most screens reduce to 4 points at the smallest epsilon, so try that first
+    mults = [0.02, 0.03, 0.04, 0.05, 0.06, 0.08, 0.10]
+    approx = cv2.approxPolyDP(largest, mults[0] * peri, True)
+    if len(approx) == 4:
+        return approx.reshape(4, 2).astype(np.float32)
+
+    # Otherwise binary-search the rest for the smallest epsilon that gets down to 4
+    # points. The vertex count usually, but not always, falls as epsilon grows, so on
+    # an irregular contour this can settle on a later polygon than a linear scan
+    lo, hi, found = 1, len(mults) - 1, None
+    while lo <= hi:
+        mid = (lo + hi) // 2
+        approx = cv2.approxPolyDP(largest, mults[mid] * peri, True)
+        if len(approx) <= 4:
+            found, hi = approx, mid - 1
+        else:
+            lo = mid + 1
+    if found is not None and len(found) == 4:
+        return found.reshape(4, 2).astype(np.float32)
 
     # Fallback to minAreaRect
     rect = cv2.minAreaRect(largest)
@@ -49,100 +112,246 @@ def find_corners(mask):
 
 def order_corners(pts):
     """Sort 4 points into TL, TR, BR, BL using sum/difference heuristic."""
-    pts = pts.astype(np.float32)
-    s = pts.sum(axis=1)
-    d = np.diff(pts, axis=1).flatten()
-
-    tl = pts[np.argmin(s)]
-    br = pts[np.argmax(s)]
-    tr = pts[np.argmin(d)]
-    bl = pts[np.argmax(d)]
+    # Plain Python on four points avoids a handful of tiny NumPy dispatches per call
+    pts = pts.astype(np.float32).tolist()
+    tl = min(pts, key=lambda p: p[0] + p[1])
+    br = max(pts, key=lambda p: p[0] + p[1])
+    tr = min(pts, key=lambda p: p[1] - p[0])
+    bl = max(pts, key=lambda p: p[1] - p[0])
 
     return np.array([tl, tr, br, bl], dtype=np.float32)
 
 
-def apply_perspective(screenshot, corners, base_shape):
-    """Warp screenshot into the quadrilateral defined by corners."""
-    h, w = screenshot.shape[:2]
+def perspective_matrix(src_shape, corners):
+    """Transform mapping an image of src_shape onto the quadrilateral defined by corners."""
+    h, w = src_shape[:2]
     src = np.array([[0, 0], [w, 0], [w, h], [0, h]], dtype=np.float32)
     dst = order_corners(corners)
-    M = cv2.getPerspectiveTransform(src, dst)
-    warped = cv2.warpPerspective(screenshot, M, (base_shape[1], base_shape[0]),
-                                  flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_CONSTANT)
-    return warped
+    return cv2.getPerspectiveTransform(src, dst)
+
+
+def _warp_cuda(screenshot, M, dsize, dst_buf=None):
+    """Warp one screenshot on the GPU with blocking upload and download (experimental)."""
+    gpu_src = cv2.cuda_GpuMat()
+    gpu_src.upload(screenshot)
+    gpu_dst = cv2.cuda.warpPerspective(gpu_src, M, dsize, flags=cv2.INTER_LINEAR,
+                                       borderMode=cv2.BORDER_CONSTANT)
+    return gpu_dst.download() if dst_buf is None else gpu_dst.download(dst_buf)
+
+
+def _warp(screenshot, M, dsize, dst_buf=None):
+    """Warp with a precomputed transform, writing into dst_buf when given."""
+    if DEVICE == "cuda":
+        return _warp_cuda(screenshot, M, dsize, dst_buf)
+    return cv2.warpPerspective(screenshot, M, dsize, dst=dst_buf,
+                               flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_CONSTANT)
+
+
+def apply_perspective(screenshot, corners, base_shape):
+    """Warp screenshot into the quadrilateral defined by corners."""
+    M = perspective_matrix(screenshot.shape, corners)
+    return _warp(screenshot, M, (base_shape[1], base_shape[0]))
+
+
+def _warp_batch(screenshots, M, dsize, outs=None):
+    """Warp same-shaped screenshots, writing into outs (one array per screenshot) when given.
+
+    Groups of PACKED_WARP_MIN or more are merged along the channel axis so the inverse
+    map is walked once for the whole group, then scattered back with mixChannels. The
+    CUDA warp takes at most 4 channels, so on that device every frame is warped alone.
+    """
+    if outs is None:
+        outs = [np.empty((dsize[1], dsize[0], s.shape[2]), dtype=s.dtype) for s in screenshots]
+    if DEVICE == "cuda" or len(screenshots) < PACKED_WARP_MIN:
+        return [_warp(screenshot, M, dsize, out) for screenshot, out in zip(screenshots, outs)]
+
+    warped = _warp(cv2.merge(screenshots), M, dsize)
+    from_to = [c for c in range(warped.shape[2]) for _ in range(2)]
+    cv2.mixChannels([warped], outs, from_to)
+    return outs
+
+
+def _quad_roi(ordered, base_shape, pad):
+    """Bounding box (x0, y0, x1, y1) of the quad grown by pad, clipped to the base."""
+    h, w = base_shape[:2]
+    x0 = min(max(int(np.floor(ordered[:, 0].min())) - pad, 0), w - 1)
+    y0 = min(max(int(np.floor(ordered[:, 1].min())) - pad, 0), h - 1)
+    x1 = max(min(int(np.ceil(ordered[:, 0].max())) + 1 + pad, w), x0 + 1)
+    y1 = max(min(int(np.ceil(ordered[:, 1].max())) + 1 + pad, h), y0 + 1)
+    return x0, y0, x1, y1
+
+
+def _roi_matrix(M, roi):
+    """Shift transform M so that it warps straight into roi's coordinate frame."""
+    shift = np.array([[1, 0, -roi[0]], [0, 1, -roi[1]], [0, 0, 1]], dtype=M.dtype)
+    return shift @ M
+
+
+def _roi_mask(ordered, roi):
+    """Filled quad mask in roi's coordinate frame."""
+    x0, y0, x1, y1 = roi
+    comp_mask = np.zeros((y1 - y0, x1 - x0), dtype=np.uint8)
+    cv2.fillConvexPoly(comp_mask, ordered.astype(np.int32) - np.int32([x0, y0]), 255)
+    return comp_mask
+
+
+def _surround_ring(mask, scale=1.0):
+    """Band of base pixels around the screen region, used to auto-match brightness.
+
+    scale is the mask size relative to full resolution; the band narrows with it.
+    """
+    # Binary dilation by a 73x73 square (about three passes of a 25x25 ellipse) is
+    # "any mask pixel in the window": an unnormalized box sum saturates to 255 there
+    ksize = _odd(73 * scale)
+    dilated = cv2.boxFilter(mask, -1, (ksize, ksize), normalize=False,
+                            borderType=cv2.BORDER_CONSTANT)
+    return cv2.subtract(dilated, mask)
+
+
+def _surround_l(base, mask, scale=1.0):
+    """Mean LAB lightness of the base around the screen region, None if the ring is too thin."""
+    ring = _surround_ring(mask, scale)
+    if cv2.countNonZero(ring) <= 100:
+        return None
+    return cv2.mean(cv2.cvtColor(base, cv2.COLOR_BGR2LAB), mask=ring)[0]
+
+
+def _affine_lut(factor=1.0, offset=0.0):
+    """256-entry table for v -> factor * v + offset in Q8 fixed point, saturated to uint8."""
+    factor_q8 = int(round(factor * 256))
+    offset_q8 = int(round(offset * 256))
+    values = (np.arange(256, dtype=np.int32) * factor_q8 + offset_q8 + 128) >> 8
+    return np.clip(values, 0, 255).astype(np.uint8)
+
+
+def _lab_lut(l_map, a_map, b_map):
+    """Stack per-channel tables into one 3-channel table for cv2.LUT on a LAB image."""
+    return np.dstack([l_map, a_map, b_map]).reshape(256, 1, 3)
+
+
+def _blur_radius(blur):
+    """Integer Gaussian blur radius for a blur setting, at least 1 for any positive blur."""
+    return max(1, int(round(blur))) if blur > 0 else 0
 
 
 def adjust_lighting(warped, base, mask, brightness=0, contrast=0, temperature=0,
-                    saturation=0, blur=0):
-    """Adjust lighting of warped screenshot to match base image surroundings."""
+                    saturation=0, blur=0, target_l=None, roi=None, screen=None):
+    """Adjust lighting of warped screenshot to match base image surroundings.
+
+    target_l, the surround lightness from prepare_base, saves recomputing it per call.
+    If roi (x0, y0, x1, y1) is given, warped covers only that box of the base.
+    screen masks the screenshot's own pixels in warped (the filled quad, see
+    _roi_mask); the auto-match averages over it alone, so border padding never
+    counts. It defaults to the green mask.
+    """
+    if screen is None:
+        screen = mask if roi is None else mask[roi[1]:roi[3], roi[0]:roi[2]]
+
     if brightness == 0 and contrast == 0 and temperature == 0 and saturation == 0 and blur == 0:
         # Auto-match brightness from surrounding area
-        kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (25, 25))
-        dilated = cv2.dilate(mask, kernel, iterations=3)
-        ring = cv2.subtract(dilated, mask)
-
-        if np.count_nonzero(ring) > 100:
-            base_lab = cv2.cvtColor(base, cv2.COLOR_BGR2LAB)
-            ring_l = base_lab[:, :, 0][ring > 0]
-            target_l = float(np.mean(ring_l))
+        if target_l is None:
+            target_l = _surround_l(base, mask)
 
+        if target_l is not None and cv2.countNonZero(screen) > 0:
             warped_lab = cv2.cvtColor(warped, cv2.COLOR_BGR2LAB)
-            warped_region_l = warped_lab[:, :, 0][mask > 0]
-            if len(warped_region_l) > 0:
-                current_l = float(np.mean(warped_region_l))
-                shift = target_l - current_l
-                l_channel = warped_lab[:, :, 0].astype(np.float32)
-                l_channel = np.clip(l_channel + shift * 0.5, 0, 255)
-                warped_lab[:, :, 0] = l_channel.astype(np.uint8)
-                warped = cv2.cvtColor(warped_lab, cv2.COLOR_LAB2BGR)
+            current_l = cv2.mean(warped_lab, mask=screen)[0]
+            shift = target_l - current_l
+            lut = _lab_lut(_affine_lut(offset=shift * 0.5), _affine_lut(), _affine_lut())
+            warped = cv2.cvtColor(cv2.LUT(warped_lab, lut), cv2.COLOR_LAB2BGR)
         return warped
 
-    warped_lab = cv2.cvtColor(warped, cv2.COLOR_BGR2LAB)
-    l_channel = warped_lab[:, :, 0].astype(np.float32)
-    b_channel = warped_lab[:, :, 2].astype(np.float32)
+    # All colour edits happen in a single LAB round trip. Each one maps a uint8 channel
+    # to uint8, so they are folded into one fixed-point lookup table per channel
+    if brightness != 0 or contrast != 0 or temperature != 0 or saturation != 0:
+        warped_lab = cv2.cvtColor(warped, cv2.COLOR_BGR2LAB)
 
-    # Manual brightness: shift L channel
-    if brightness != 0:
-        l_channel = l_channel + brightness
-    # Manual contrast: scale L channel around its mean
-    if contrast != 0:
-        mean_l = np.mean(l_channel)
+        # Manual brightness shifts L and contrast scales it around its mean; together
+        # they are one affine map L' = factor * L + brightness + (1 - factor) * mean
         factor = (100 + contrast) / 100.0
-        l_channel = mean_l + factor * (l_channel - mean_l)
-    # Manual temperature: shift B channel (positive=warm, negative=cool)
-    if temperature != 0:
-        b_channel = b_channel + temperature
-
-    warped_lab[:, :, 0] = np.clip(l_channel, 0, 255).astype(np.uint8)
-    warped_lab[:, :, 2] = np.clip(b_channel, 0, 255).astype(np.uint8)
-    warped = cv2.cvtColor(warped_lab, cv2.COLOR_LAB2BGR)
-
-    # Saturation: convert to HSV, scale S channel
-    if saturation != 0:
-        hsv = cv2.cvtColor(warped, cv2.COLOR_BGR2HSV).astype(np.float32)
-        factor = (100 + saturation) / 100.0
-        hsv[:, :, 1] = np.clip(hsv[:, :, 1] * factor, 0, 255)
-        warped = cv2.cvtColor(hsv.astype(np.uint8), cv2.COLOR_HSV2BGR)
+        offset = brightness
+        if contrast != 0:
+            # The pivot is the mean L of a full base-sized warp. Black padding has L = 0,
+            # so the roi's L sum over the base pixel count gives it whatever the padding
+            offset += (1 - factor) * cv2.sumElems(warped_lab)[0] / (base.shape[0] * base.shape[1])
+        # Manual temperature shifts B (positive=warm, negative=cool), then saturation
+        # scales chroma (A and B) around neutral grey
+        chroma = (100 + saturation) / 100.0
+        lut = _lab_lut(_affine_lut(factor, offset),
+                       _affine_lut(chroma, 128 * (1 - chroma)),
+                       _affine_lut(chroma, chroma * temperature + 128 * (1 - chroma)))
+
+        warped = cv2.cvtColor(cv2.LUT(warped_lab, lut), cv2.COLOR_LAB2BGR)
 
     # Blur: Gaussian blur with odd kernel size
     if blur > 0:
-        ksize = int(blur) * 2 + 1
+        ksize = _blur_radius(blur) * 2 + 1
         warped = cv2.GaussianBlur(warped, (ksize, ksize), 0)
 
     return warped
 
 
+def _precompute_alpha(mask):
+    """Feather mask into (screenshot, base) blend weights for _blend."""
+    blurred_mask = cv2.blur(mask, (2 * FEATHER_RADIUS + 1,) * 2)
+    # blendLinear normalizes by the weight sum, so the 0-255 mask works as alpha directly
+    alpha = blurred_mask.astype(np.float32)
+    return alpha, 255 - alpha
+
+
+def _blend(base, warped, alpha):
+    """Blend warped over base using weights from _precompute_alpha."""
+    return cv2.blendLinear(warped, base, alpha[0], alpha[1])
+
+
 def composite(base, warped, mask):
     """Alpha-composite warped image onto base with feathered edges."""
-    blurred_mask = cv2.GaussianBlur(mask, (5, 5), 0)
-    alpha = blurred_mask.astype(np.float32) / 255.0
+    return _blend(base, warped, _precompute_alpha(mask))
+
+
+def _composite_roi(base, warped, alpha, roi, out=None):
+    """Blend warped into roi of base; everything outside roi is copied from base.
+
+    out, if given, must already match base outside roi (e.g. a base.copy() reused
+    across calls with the same roi); only its roi is rewritten.
+    """
+    x0, y0, x1, y1 = roi
+    result = base.copy() if out is None else out
+    result[y0:y1, x0:x1] = _blend(base[y0:y1, x0:x1], warped, alpha)
+    return result
+
+
+def prepare_base(base, hue_range=(35, 85), sat_min=50, val_min=50, scale=1.0):
+    """Precompute what depends on the base alone, for reuse across screenshots.
+
+    scale is the base size relative to full resolution (below 1 for a downscaled
+    preview), so the mask and ring kernels cover the same area at either size.
+    Returns a dict with the base, its green mask, the auto-match target lightness
+    and the scale; the quad mask and feathered composite weights for the last
+    corners used are cached in it too.
+    """
+    mask = detect_green_mask(base, hue_range, sat_min, val_min, scale)
+    return {"base": base, "mask": mask, "target_l": _surround_l(base, mask, scale),
+            "scale": scale, "quad": None}
 
-    if len(alpha.shape) == 2:
-        alpha = alpha[:, :, np.newaxis]
 
-    result = (warped.astype(np.float32) * alpha +
-              base.astype(np.float32) * (1 - alpha))
-    return result.astype(np.uint8)
+def _pack_quad(pack, ordered, roi):
+    """(quad mask, composite weights) for ordered/roi, reused while the corners don't change."""
+    key = (ordered.tobytes(), roi)
+    if pack["quad"] is None or pack["quad"][0] != key:
+        comp_mask = _roi_mask(ordered, roi)
+        pack["quad"] = (key, comp_mask, _precompute_alpha(comp_mask))
+    return pack["quad"][1:]
+
+
+@contextmanager
+def _opencv_threads(n):
+    """Temporarily limit OpenCV's internal thread pool to n threads."""
+    previous = cv2.getNumThreads()
+    cv2.setNumThreads(n)
+    try:
+        yield
+    finally:
+        cv2.setNumThreads(previous)
 
 
 def process(base_path, screenshot_path, output_path, corners=None,
@@ -157,20 +366,8 @@ def process(base_path, screenshot_path, output_path, corners=None,
     if screenshot is None:
         raise FileNotFoundError(f"Cannot read screenshot: {screenshot_path}")
 
-    mask = detect_green_mask(base, hue_range, sat_min, val_min)
-
-    if corners is None:
-        corners = find_corners(mask)
-
-    ordered = order_corners(corners)
-    warped = apply_perspective(screenshot, ordered, base.shape)
-    warped = adjust_lighting(warped, base, mask, brightness, contrast, temperature)
-
-    # Create mask from ordered corners for compositing
-    comp_mask = np.zeros(base.shape[:2], dtype=np.uint8)
-    cv2.fillConvexPoly(comp_mask, ordered.astype(np.int32), 255)
-
-    result = composite(base, warped, comp_mask)
+    result = process_from_arrays(base, screenshot, corners, brightness, contrast, temperature,
+                                 hue_range=hue_range, sat_min=sat_min, val_min=val_min)
 
     os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
     cv2.imwrite(output_path, result)
@@ -186,7 +383,8 @@ def process_bulk(base_path, screenshot_paths, output_dir, corners=None,
     if base is None:
         raise FileNotFoundError(f"Cannot read base image: {base_path}")
 
-    mask = detect_green_mask(base, hue_range, sat_min, val_min)
+    pack = prepare_base(base, hue_range, sat_min, val_min)
+    mask, target_l = pack["mask"], pack["target_l"]
 
     if corners is None:
         corners = find_corners(mask)
@@ -194,25 +392,69 @@ def process_bulk(base_path, screenshot_paths, output_dir, corners=None,
     ordered = order_corners(corners)
     os.makedirs(output_dir, exist_ok=True)
 
-    comp_mask = np.zeros(base.shape[:2], dtype=np.uint8)
-    cv2.fillConvexPoly(comp_mask, ordered.astype(np.int32), 255)
+    # Only the quad's bounding box is warped and blended; the rest is copied from base
+    roi = _quad_roi(ordered, base.shape, FEATHER_RADIUS)
+    screen, alpha = _pack_quad(pack, ordered, roi)
 
-    results = []
-    for ss_path in screenshot_paths:
-        screenshot = cv2.imread(ss_path)
-        if screenshot is None:
-            print(f"Warning: skipping unreadable file {ss_path}", file=sys.stderr)
-            continue
+    # Transforms depend only on screenshot shape; every batch warps into the same
+    # per-slot frames (imread always yields 3-channel uint8)
+    dsize = (roi[2] - roi[0], roi[3] - roi[1])
+    matrices = {}
+    frames = np.empty((BULK_BATCH, dsize[1], dsize[0], 3), dtype=np.uint8)
+
+    # Each worker thread keeps one output frame; only its roi changes between screenshots
+    scratch = threading.local()
 
-        warped = apply_perspective(screenshot, ordered, base.shape)
-        warped = adjust_lighting(warped, base, mask, brightness, contrast, temperature)
-        result = composite(base, warped, comp_mask)
+    def finish(ss_path, warped):
+        warped = adjust_lighting(warped, base, mask, brightness, contrast, temperature,
+                                 target_l=target_l, roi=roi, screen=screen)
+        if not hasattr(scratch, "result"):
+            scratch.result = base.copy()
+        result = _composite_roi(base, warped, alpha, roi, out=scratch.result)
 
         name = os.path.splitext(os.path.basename(ss_path))[0]
         out_path = os.path.join(output_dir, f"{name}_composite.png")
         cv2.imwrite(out_path, result)
-        print(f"Saved: {out_path}")
-        results.append(out_path)
+        return out_path
+
+    # Screenshots are independent and OpenCV releases the GIL, so spread them over
+    # threads with one OpenCV thread each to avoid oversubscribing the cores
+    workers = 1
+    if base.shape[0] * base.shape[1] <= PARALLEL_MAX_PIXELS:
+        workers = max(1, min(len(screenshot_paths), os.cpu_count() or 1))
+    pool_threads = 1 if workers > 1 else cv2.getNumThreads()
+
+    results = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for start in range(0, len(screenshot_paths), BULK_BATCH):
+            paths = screenshot_paths[start:start + BULK_BATCH]
+            with _opencv_threads(pool_threads):
+                images = list(pool.map(cv2.imread, paths))
+            loaded = []
+            for ss_path, screenshot in zip(paths, images):
+                if screenshot is None:
+                    print(f"Warning: skipping unreadable file {ss_path}", file=sys.stderr)
+                    continue
+                loaded.append((ss_path, screenshot))
+
+            # Same-shaped screenshots share a transform, so warp each group together
+            groups = {}
+            for i, (_, screenshot) in enumerate(loaded):
+                groups.setdefault(screenshot.shape, []).append(i)
+            warped_all = list(frames[:len(loaded)])
+            for shape, indices in groups.items():
+                if shape not in matrices:
+                    matrices[shape] = _roi_matrix(perspective_matrix(shape, ordered), roi)
+                batch = [loaded[i][1] for i in indices]
+                outs = _warp_batch(batch, matrices[shape], dsize, [warped_all[i] for i in indices])
+                for i, warped in zip(indices, outs):
+                    warped_all[i] = warped
+
+            with _opencv_threads(pool_threads):
+                out_paths = list(pool.map(finish, [p for p, _ in loaded], warped_all))
+            for out_path in out_paths:
+                print(f"Saved: {out_path}")
+                results.append(out_path)
 
     return results
 
@@ -220,28 +462,37 @@ def process_bulk(base_path, screenshot_paths, output_dir, corners=None,
 def process_from_arrays(base, screenshot, corners=None,
                         brightness=0, contrast=0, temperature=0,
                         saturation=0, blur=0,
-                        hue_range=(35, 85), sat_min=50, val_min=50):
-    """Process from numpy arrays (for server use). Returns result array."""
-    mask = detect_green_mask(base, hue_range, sat_min, val_min)
+                        hue_range=(35, 85), sat_min=50, val_min=50, pack=None):
+    """Process from numpy arrays (for server use). Returns result array.
+
+    pack, from prepare_base(base), skips the per-base detection work.
+    """
+    if pack is None:
+        pack = prepare_base(base, hue_range, sat_min, val_min)
+    mask = pack["mask"]
 
     if corners is None:
-        corners = find_corners(mask)
+        corners = find_corners(mask, pack["scale"])
 
     ordered = order_corners(corners)
-    warped = apply_perspective(screenshot, ordered, base.shape)
-    warped = adjust_lighting(warped, base, mask, brightness, contrast, temperature,
-                             saturation, blur)
 
-    comp_mask = np.zeros(base.shape[:2], dtype=np.uint8)
-    cv2.fillConvexPoly(comp_mask, ordered.astype(np.int32), 255)
+    # Only the quad's bounding box is warped and blended; the padding covers the edge
+    # feather and the blur radius
+    roi = _quad_roi(ordered, base.shape, FEATHER_RADIUS + _blur_radius(blur))
+    M = _roi_matrix(perspective_matrix(screenshot.shape, ordered), roi)
+    warped = _warp(screenshot, M, (roi[2] - roi[0], roi[3] - roi[1]))
+    screen, alpha = _pack_quad(pack, ordered, roi)
+    warped = adjust_lighting(warped, base, mask, brightness, contrast, temperature,
+                             saturation, blur, target_l=pack["target_l"], roi=roi,
+                             screen=screen)
 
-    return composite(base, warped, comp_mask)
+    return _composite_roi(base, warped, alpha, roi)
 
 
-def detect_from_array(image, hue_range=(35, 85), sat_min=50, val_min=50):
+def detect_from_array(image, hue_range=(35, 85), sat_min=50, val_min=50, scale=1.0):
     """Detect green screen corners from numpy array. Returns ordered corners."""
-    mask = detect_green_mask(image, hue_range, sat_min, val_min)
-    corners = find_corners(mask)
+    mask = detect_green_mask(image, hue_range, sat_min, val_min, scale)
+    corners = find_corners(mask, scale)
     return order_corners(corners)
 
 
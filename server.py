@@ -1,12 +1,14 @@
 """FastAPI web server for green screen replacement tool."""
 
 import base64
+import hashlib
 import json
 import os
+from collections import OrderedDict
 
 import cv2
 import numpy as np
-from fastapi import FastAPI, File, Form, UploadFile
+from fastapi import FastAPI, File, Form, HTTPException, UploadFile
 from fastapi.responses import HTMLResponse, Response
 from fastapi.staticfiles import StaticFiles
 
@@ -16,11 +18,107 @@ app = FastAPI(title="Green Screen Replacement")
 
 MAX_PREVIEW_WIDTH = 1200
 
+# Decoded bases (plus green mask, quad mask and feather weights) kept between requests,
+# keyed by (SHA-256 of the upload, preview resolution or not). Bounded by size rather than
+# count: a full-res 12MP entry takes 60-85MB and a preview one about 10MB, and the free
+# Render instance has 512MB in total
+BASE_CACHE_BYTES = 128 * 1024 * 1024
+_base_cache = OrderedDict()
+
+JPEG_MAGIC = b"\xff\xd8\xff"
+
+# libjpeg-turbo is used for JPEG decode/encode when available; set
+# GREENSCREEN_NO_TURBOJPEG=1 to force OpenCV's codecs
+_tj = None
+if not os.environ.get("GREENSCREEN_NO_TURBOJPEG"):
+    try:
+        from turbojpeg import TJPF_BGR, TurboJPEG
+        _tj = TurboJPEG()
+    except (ImportError, OSError, RuntimeError):
+        # PyTurboJPEG or the libturbojpeg shared library is missing
+        pass
+
+# EXIF orientation tag -> transform, mirroring what cv2.imdecode applies itself
+EXIF_TRANSFORMS = {
+    2: lambda img: cv2.flip(img, 1),
+    3: lambda img: cv2.rotate(img, cv2.ROTATE_180),
+    4: lambda img: cv2.flip(img, 0),
+    5: cv2.transpose,
+    6: lambda img: cv2.rotate(img, cv2.ROTATE_90_CLOCKWISE),
+    7: lambda img: cv2.rotate(cv2.transpose(img), cv2.ROTATE_180),
+    8: lambda img: cv2.rotate(img, cv2.ROTATE_90_COUNTERCLOCKWISE),
+}
+
+
+def jpeg_segments(data):
+    """Yield (marker, payload) for each JPEG header segment up to start-of-scan."""
+    i = 2
+    while i + 4 <= len(data) and data[i] == 0xFF:
+        marker = data[i + 1]
+        length = int.from_bytes(data[i + 2:i + 4], "big")
+        yield marker, data[i + 4:i + 2 + length]
+        if marker == 0xDA:
+            return
+        i += 2 + length
+
+
+def jpeg_orientation(data):
+    """Read the EXIF orientation tag from JPEG bytes, 1 if absent."""
+    for marker, payload in jpeg_segments(data):
+        if marker != 0xE1 or payload[:6] != b"Exif\0\0":
+            continue
+        tiff = payload[6:]
+        order = "little" if tiff[:2] == b"II" else "big"
+        ifd = int.from_bytes(tiff[4:8], order)
+        for n in range(int.from_bytes(tiff[ifd:ifd + 2], order)):
+            entry = tiff[ifd + 2 + 12 * n:ifd + 14 + 12 * n]
+            if int.from_bytes(entry[:2], order) == 0x0112:
+                return int.from_bytes(entry[8:10], order)
+    return 1
+
+
+# Start-of-frame markers (baseline, progressive, lossless, arithmetic variants)
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7,
+                    0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+# JPEG downscale factor -> imdecode flag that decodes directly at that size
+REDUCED_DECODE_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+
+def jpeg_size(data):
+    """Displayed (width, height) of a JPEG read from its header, None if not found."""
+    for marker, payload in jpeg_segments(data):
+        if marker in JPEG_SOF_MARKERS and len(payload) >= 5:
+            height = int.from_bytes(payload[1:3], "big")
+            width = int.from_bytes(payload[3:5], "big")
+            # Orientations 5-8 rotate by 90 degrees
+            if jpeg_orientation(data) >= 5:
+                width, height = height, width
+            return width, height
+    return None
+
+
+def decode_upload(file_bytes, reduce=1):
+    """Decode uploaded image bytes to numpy array.
+
+    reduce (1, 2, 4 or 8) decodes JPEGs directly at that fraction of full size.
+    """
+    if _tj is not None and file_bytes[:3] == JPEG_MAGIC:
+        try:
+            img = _tj.decode(file_bytes, pixel_format=TJPF_BGR, scaling_factor=(1, reduce))
+        except OSError:
+            img = None
+        if img is not None:
+            transform = EXIF_TRANSFORMS.get(jpeg_orientation(file_bytes))
+            return transform(img) if transform else img
 
-def decode_upload(file_bytes):
-    """Decode uploaded image bytes to numpy array."""
     arr = np.frombuffer(file_bytes, np.uint8)
-    img = cv2.imdecode(arr, cv2.IMREAD_COLOR)
+    img = cv2.imdecode(arr, REDUCED_DECODE_FLAGS[reduce])
     if img is None:
         raise ValueError("Could not decode image")
     return img
@@ -28,6 +126,9 @@ def decode_upload(file_bytes):
 
 def encode_image(img, fmt=".png"):
     """Encode numpy array to bytes."""
+    if _tj is not None and fmt == ".jpg":
+        # Quality 95 matches cv2.imencode's default
+        return _tj.encode(img, quality=95, pixel_format=TJPF_BGR)
     _, buf = cv2.imencode(fmt, img)
     return buf.tobytes()
 
@@ -42,6 +143,70 @@ def resize_for_preview(img, max_width=MAX_PREVIEW_WIDTH):
     return cv2.resize(img, (new_w, new_h), interpolation=cv2.INTER_AREA), scale
 
 
+def decode_for_preview(file_bytes):
+    """Decode an upload at preview size, return (image, scale relative to full size).
+
+    Large JPEGs are decoded at 1/2, 1/4 or 1/8 scale, as long as that still covers
+    the preview width, and resized from there.
+    """
+    size = jpeg_size(file_bytes) if file_bytes[:3] == JPEG_MAGIC else None
+    reduce = 1
+    if size:
+        reduce = next((n for n in (8, 4, 2) if size[0] // n >= MAX_PREVIEW_WIDTH), 1)
+    img = decode_upload(file_bytes, reduce)
+    width = size[0] if reduce > 1 else img.shape[1]
+    img, _ = resize_for_preview(img)
+    return img, img.shape[1] / width
+
+
+def nbytes(value):
+    """Bytes held by the numpy arrays in value, looking inside dicts, tuples and lists."""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        value = value.values()
+    elif not isinstance(value, (tuple, list)):
+        return 0
+    return sum(nbytes(v) for v in value)
+
+
+def trim_base_cache():
+    """Evict least recently used bases until the cache fits BASE_CACHE_BYTES.
+
+    The most recent entry is always kept. Entries grow once their feather weights are
+    cached, so this also runs on cache hits.
+    """
+    while len(_base_cache) > 1 and sum(map(nbytes, _base_cache.values())) > BASE_CACHE_BYTES:
+        _base_cache.popitem(last=False)
+
+
+async def load_base(base, base_hash, preview):
+    """Return (hash, prepared base pack) for an upload or a previously uploaded hash."""
+    if base is not None:
+        raw_bytes = await base.read()
+        base_hash = hashlib.sha256(raw_bytes).hexdigest()
+    elif not base_hash:
+        raise HTTPException(status_code=400, detail="base or base_hash is required")
+
+    key = (base_hash, preview)
+    pack = _base_cache.get(key)
+    if pack is not None:
+        _base_cache.move_to_end(key)
+        trim_base_cache()
+        return base_hash, pack
+    if base is None:
+        raise HTTPException(status_code=404, detail="Unknown base_hash, upload the base image")
+
+    if preview:
+        base_img, scale = decode_for_preview(raw_bytes)
+    else:
+        base_img, scale = decode_upload(raw_bytes), 1.0
+    pack = greenscreen.prepare_base(base_img, scale=scale)
+    _base_cache[key] = pack
+    trim_base_cache()
+    return base_hash, pack
+
+
 @app.get("/", response_class=HTMLResponse)
 async def index():
     with open(os.path.join("static", "index.html")) as f:
@@ -59,24 +224,36 @@ async def templates():
 @app.post("/api/detect")
 async def detect(base: UploadFile = File(...)):
     """Upload base image, return detected corners and preview."""
-    base_img = decode_upload(await base.read())
+    raw_bytes = await base.read()
+
+    # Detection runs at full resolution so corners match the CLI's --detect-only
+    base_img = decode_upload(raw_bytes)
+    height, width = base_img.shape[:2]
     corners = greenscreen.detect_from_array(base_img)
 
-    preview, scale = resize_for_preview(base_img)
-    preview_b64 = base64.b64encode(encode_image(preview, ".jpg")).decode()
+    # An upright JPEG that already fits the preview is sent back as-is, skipping a re-encode
+    if (raw_bytes[:3] == JPEG_MAGIC and width <= MAX_PREVIEW_WIDTH
+            and jpeg_orientation(raw_bytes) == 1):
+        preview_bytes, scale = raw_bytes, 1.0
+    else:
+        preview, _ = resize_for_preview(base_img)
+        preview_bytes = encode_image(preview, ".jpg")
+        scale = preview.shape[1] / width
+    preview_b64 = base64.b64encode(preview_bytes).decode()
 
     return {
         "corners": corners.tolist(),
         "image": preview_b64,
-        "width": base_img.shape[1],
-        "height": base_img.shape[0],
+        "width": width,
+        "height": height,
         "preview_scale": scale,
     }
 
 
 @app.post("/api/preview")
 async def preview(
-    base: UploadFile = File(...),
+    base: UploadFile = File(None),
+    base_hash: str = Form(None),
     screenshot: UploadFile = File(...),
     corners: str = Form(...),
     brightness: float = Form(0),
@@ -86,25 +263,27 @@ async def preview(
     blur: float = Form(0),
 ):
     """Generate preview with given parameters."""
-    base_img = decode_upload(await base.read())
-    ss_img = decode_upload(await screenshot.read())
+    # Work at preview resolution: the client never displays more than MAX_PREVIEW_WIDTH
+    base_hash, pack = await load_base(base, base_hash, preview=True)
+    scale = pack["scale"]
+    ss_img, _ = decode_for_preview(await screenshot.read())
 
-    corner_pts = np.array(json.loads(corners), dtype=np.float32)
+    corner_pts = np.array(json.loads(corners), dtype=np.float32) * scale
 
     result = greenscreen.process_from_arrays(
-        base_img, ss_img, corners=corner_pts,
+        pack["base"], ss_img, corners=corner_pts,
         brightness=brightness, contrast=contrast, temperature=temperature,
-        saturation=saturation, blur=blur,
+        saturation=saturation, blur=blur * scale, pack=pack,
     )
 
-    preview, _ = resize_for_preview(result)
-    result_b64 = base64.b64encode(encode_image(preview, ".jpg")).decode()
-    return {"image": result_b64}
+    result_b64 = base64.b64encode(encode_image(result, ".jpg")).decode()
+    return {"image": result_b64, "base_hash": base_hash}
 
 
 @app.post("/api/process-one")
 async def process_one(
-    base: UploadFile = File(...),
+    base: UploadFile = File(None),
+    base_hash: str = Form(None),
     screenshot: UploadFile = File(...),
     corners: str = Form(...),
     brightness: float = Form(0),
@@ -114,15 +293,15 @@ async def process_one(
     blur: float = Form(0),
 ):
     """Process a single screenshot at full resolution, return PNG."""
-    base_img = decode_upload(await base.read())
+    _, pack = await load_base(base, base_hash, preview=False)
     ss_img = decode_upload(await screenshot.read())
 
     corner_pts = np.array(json.loads(corners), dtype=np.float32)
 
     result = greenscreen.process_from_arrays(
-        base_img, ss_img, corners=corner_pts,
+        pack["base"], ss_img, corners=corner_pts,
         brightness=brightness, contrast=contrast, temperature=temperature,
-        saturation=saturation, blur=blur,
+        saturation=saturation, blur=blur, pack=pack,
     )
 
     result_bytes = encode_image(result, ".png")
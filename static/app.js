@@ -575,6 +575,57 @@
     debounceTimer = setTimeout(requestPreview, 300);
   }
 
+  // -- Base caching --------------------------------------------------------
+  // The server keeps recently used bases keyed by SHA-256. After one upload per
+  // endpoint only the hash is sent; a 404 means it was evicted, so re-upload.
+
+  let baseHashFile = null;        // baseFile that baseHash belongs to
+  let baseHash = null;
+  const baseCachedAt = new Set(); // endpoints that already hold the current base
+
+  async function currentBaseHash() {
+    if (baseHashFile !== baseFile) {
+      baseHashFile = baseFile;
+      baseHash = null;
+      baseCachedAt.clear();
+      if (window.crypto && crypto.subtle) {
+        const digest = await crypto.subtle.digest("SHA-256", await baseFile.arrayBuffer());
+        baseHash = Array.from(new Uint8Array(digest), (b) => b.toString(16).padStart(2, "0")).join("");
+      }
+    }
+    return baseHash;
+  }
+
+  async function postWithBase(url, fields) {
+    const hash = await currentBaseHash();
+    const send = (withFile) => {
+      const form = new FormData();
+      if (withFile) form.append("base", baseFile);
+      else form.append("base_hash", hash);
+      for (const [name, value] of fields) form.append(name, value);
+      return fetch(url, { method: "POST", body: form });
+    };
+
+    if (hash && baseCachedAt.has(url)) {
+      const res = await send(false);
+      if (res.status !== 404) return res;
+    }
+    const res = await send(true);
+    if (res.ok && hash) baseCachedAt.add(url);
+    return res;
+  }
+
+  function adjustmentFields() {
+    return [
+      ["corners", JSON.stringify(corners)],
+      ["brightness", $("#brightness").value],
+      ["contrast", $("#contrast").value],
+      ["temperature", $("#temperature").value],
+      ["saturation", $("#saturation").value],
+      ["blur", $("#blur").value],
+    ];
+  }
+
   let previewInFlight = false;
 
   async function requestPreview() {
@@ -586,18 +637,11 @@
     setButtonLoading(btn, true, "Previewing");
     setStatus("Generating preview...");
 
-    const form = new FormData();
-    form.append("base", baseFile);
-    form.append("screenshot", ssFiles[selectedSsIdx]);
-    form.append("corners", JSON.stringify(corners));
-    form.append("brightness", $("#brightness").value);
-    form.append("contrast", $("#contrast").value);
-    form.append("temperature", $("#temperature").value);
-    form.append("saturation", $("#saturation").value);
-    form.append("blur", $("#blur").value);
-
     try {
-      const res = await fetch("/api/preview", { method: "POST", body: form });
+      const res = await postWithBase("/api/preview", [
+        ["screenshot", ssFiles[selectedSsIdx]],
+        ...adjustmentFields(),
+      ]);
       if (!res.ok) throw new Error(await res.text());
       const data = await res.json();
 
@@ -622,17 +666,10 @@
   let resultBlobs = [];
 
   async function processOne(file) {
-    const form = new FormData();
-    form.append("base", baseFile);
-    form.append("screenshot", file);
-    form.append("corners", JSON.stringify(corners));
-    form.append("brightness", $("#brightness").value);
-    form.append("contrast", $("#contrast").value);
-    form.append("temperature", $("#temperature").value);
-    form.append("saturation", $("#saturation").value);
-    form.append("blur", $("#blur").value);
-
-    const res = await fetch("/api/process-one", { method: "POST", body: form });
+    const res = await postWithBase("/api/process-one", [
+      ["screenshot", file],
+      ...adjustmentFields(),
+    ]);
     if (!res.ok) throw new Error(await res.text());
 
     const blob = await res.blob();